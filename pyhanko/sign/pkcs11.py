@@ -8,6 +8,7 @@ import binascii
 import logging
 import struct
 import warnings
+import weakref
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
@@ -395,9 +396,29 @@ def _format_pull_err_msg(
     return err
 
 
+# Cache for certs pulled one by one, keyed (weakly) by session, then by the
+# label/ID of the cert. Cert objects on a token are static for all intents
+# and purposes, and C_FindObjects calls aren't free, so it pays to remember
+# the result if the same cert is requested again within the same session.
+# The weak keying makes cached entries die together with their session.
+_CertCacheEntry = Dict[Tuple[Optional[str], Optional[bytes]], x509.Certificate]
+_pulled_cert_cache: "weakref.WeakKeyDictionary[Session, _CertCacheEntry]" \
+    = weakref.WeakKeyDictionary()
+
+
 def _pull_cert(pkcs11_session: Session, label: Optional[str] = None,
                cert_id: Optional[bytes] = None):
 
+    try:
+        session_cache = _pulled_cert_cache[pkcs11_session]
+    except KeyError:
+        session_cache = _pulled_cert_cache[pkcs11_session] = {}
+    cache_key = (label, cert_id)
+    try:
+        return session_cache[cache_key]
+    except KeyError:
+        pass
+
     query_params = {
         Attribute.CLASS: ObjectClass.CERTIFICATE
     }
@@ -412,7 +433,9 @@ def _pull_cert(pkcs11_session: Session, label: Optional[str] = None,
     results = list(q)
     if len(results) == 1:
         cert_obj = results[0]
-        return x509.Certificate.load(cert_obj[Attribute.VALUE])
+        cert = x509.Certificate.load(cert_obj[Attribute.VALUE])
+        session_cache[cache_key] = cert
+        return cert
     else:
         err = _format_pull_err_msg(
             no_results=not results, label=label, cert_id=cert_id
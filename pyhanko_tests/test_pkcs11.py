@@ -5,17 +5,23 @@ NOTE: these are not run in CI, due to lack of testing setup.
 """
 import asyncio
 import binascii
+import functools
+import gc
+import itertools
 import logging
 import os
+import re
+import weakref
+from contextlib import nullcontext
 from io import BytesIO
-from typing import Optional
+from typing import Dict, Optional
 
 import pytest
 from asn1crypto import algos
 from asn1crypto.algos import SignedDigestAlgorithm
 from certomancer.registry import CertLabel
 from freezegun import freeze_time
-from pkcs11 import Mechanism, NoSuchKey, PKCS11Error
+from pkcs11 import Attribute, Mechanism, NoSuchKey, PKCS11Error
 from pkcs11 import types as p11_types
 from pyhanko_certvalidator.registry import SimpleCertificateStore
 
@@ -42,6 +48,13 @@ from pyhanko_tests.signing_commons import (
 
 logger = logging.getLogger(__name__)
 
+# PKCS#11 sessions can't be shared between processes, but that's fine:
+# each pytest-xdist worker runs in its own process with its own copy of
+# the session cache below. We do make sure that all tests touching the
+# same tokens end up on the same worker (under --dist loadgroup), since
+# SoftHSM doesn't take kindly to concurrent logins from several processes.
+pytestmark = pytest.mark.xdist_group("pkcs11")
+
 SKIP_PKCS11 = SOFTHSM = False
 pkcs11_test_module = os.environ.get('PKCS11_TEST_MODULE', None)
 if not pkcs11_test_module:
@@ -51,55 +64,141 @@ elif 'softhsm' in pkcs11_test_module.casefold():
     SOFTHSM = True
 
 
+# Logging into a token is by far the most expensive part of these tests
+# (C_Initialize + C_OpenSession + C_Login adds up to a nontrivial amount of
+# time per call, even on SoftHSM), so we share one open session per token
+# label across the entire test run.
+_sessions: Dict[str, p11_types.Session] = {}
+
+
+def _evict_sessions():
+    while _sessions:
+        _, sess = _sessions.popitem()
+        sess.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pkcs11_sessions():
+    try:
+        yield _sessions
+    finally:
+        _evict_sessions()
+
+
+@pytest.fixture
+def fresh_login_state():
+    # PKCS#11 login state is application-wide per token, and all sessions in
+    # this process belong to a single Cryptoki application. Hence any test
+    # that performs its own C_Login (or that relies on the token *not* being
+    # in user state) cannot coexist with the cached logged-in sessions above:
+    # it would die with CKR_USER_ALREADY_LOGGED_IN, or see private objects it
+    # shouldn't. Closing all cached sessions takes the application back to
+    # public state; _simple_sess will simply log back in afterwards.
+    _evict_sessions()
+    yield
+
+
 def _simple_sess(token='testrsa'):
-    return pkcs11.open_pkcs11_session(
-        pkcs11_test_module, user_pin='1234',
-        token_criteria=TokenCriteria(label=token)
-    )
+    try:
+        sess = _sessions[token]
+    except KeyError:
+        sess = _sessions[token] = pkcs11.open_pkcs11_session(
+            pkcs11_test_module, user_pin='1234',
+            token_criteria=TokenCriteria(label=token)
+        )
+    # wrap in a no-op context manager so callers can keep treating the
+    # session as a transient resource
+    return nullcontext(sess)
 
 
 default_other_certs = ('root', 'interm')
 SIGNER_LABEL = 'signer1'
+# a cert ID that is guaranteed not to match anything on the token
+BAD_CERT_ID = binascii.unhexlify(b'deadbeef')
+
+# precompiled error patterns for pytest.raises(..., match=...); compiling
+# these at import time means a typo blows up at collection rather than
+# halfway through a test run
+ERR_CERT_ID_NOT_FOUND = re.compile('Could not find.*with ID')
+ERR_MULTIPLE_TOKENS = re.compile('more than 1')
+
+# cert materialisation in certomancer isn't free; do it once at module load
+ROOT_CERT = TESTING_CA.get_cert(CertLabel('root'))
+INTERM_CERT = TESTING_CA.get_cert(CertLabel('interm'))
+SIGNER_CERT = TESTING_CA.get_cert(CertLabel('signer1'))
+
+
+def _fresh_writer():
+    return IncrementalPdfFileWriter(BytesIO(MINIMAL))
+
+
+# PdfSignatureMetadata is a frozen dataclass, so these can be shared
+# between tests without risk
+DEFAULT_META = signers.PdfSignatureMetadata(field_name='Sig1')
+DEFAULT_SHA256_META = signers.PdfSignatureMetadata(
+    field_name='Sig1', md_algorithm='sha256'
+)
+
+
+def _sign_and_read(w, meta, signer):
+    out = signers.sign_pdf(w, meta, signer=signer)
+    return PdfFileReader(out).embedded_signatures[0]
+
+
+def _prewarmed_signer(sess, **kwargs):
+    # For tests that don't exercise cert fetching semantics: the chain is
+    # available from TESTING_CA anyway, so passing it in directly spares us
+    # a pair of C_FindObjects calls against the token.
+    return pkcs11.PKCS11Signer(
+        sess, SIGNER_LABEL, ca_chain=(INTERM_CERT, ROOT_CERT), **kwargs
+    )
+
+
+# Build the validation contexts for the non-RSA tokens only once per run.
+# Deliberately not fixtures: fixture setup runs before freeze_time activates,
+# and ValidationContext pins its validation moment at construction time, so
+# the first call must happen inside a frozen test body.
+@functools.lru_cache(maxsize=1)
+def _dsa_vc():
+    return SIMPLE_DSA_V_CONTEXT()
+
+
+@functools.lru_cache(maxsize=1)
+def _ecc_vc():
+    return SIMPLE_ECC_V_CONTEXT()
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@pytest.mark.parametrize('bulk_fetch,pss', [(True, True), (False, False),
-                                            (True, False), (True, True)])
+@pytest.mark.parametrize(
+    'bulk_fetch,pss', list(itertools.product([True, False], [True, False]))
+)
 @freeze_time('2020-11-01')
 def test_simple_sign(bulk_fetch, pss):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch, prefer_pss=pss
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @freeze_time('2020-11-01')
-def test_simple_sign_legacy_open_session_by_token_label():
+def test_simple_sign_legacy_open_session_by_token_label(fresh_login_state):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with pytest.deprecated_call():
         with pkcs11.open_pkcs11_session(
                 pkcs11_test_module, user_pin='1234', token_label='testrsa'
         ) as sess:
-            signer = pkcs11.PKCS11Signer(
-                sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
-            )
-            out = signers.sign_pdf(w, meta, signer=signer)
+            signer = _prewarmed_signer(sess)
+            emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
@@ -107,33 +206,28 @@ def test_simple_sign_legacy_open_session_by_token_label():
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @pytest.mark.parametrize('bulk_fetch', [True, False])
 @freeze_time('2020-11-01')
-def test_sign_external_certs(bulk_fetch):
+def test_sign_external_certs(bulk_fetch, monkeypatch):
     # Test to see if unnecessary fetches for intermediate certs are skipped
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL,
-            ca_chain=(TESTING_CA.get_cert(CertLabel('interm')),),
+            ca_chain=(INTERM_CERT,),
             bulk_fetch=bulk_fetch
         )
         orig_fetcher = pkcs11._pull_cert
-        try:
-            def _trap_pull(session, *, label=None, cert_id=None):
-                if label != SIGNER_LABEL:
-                    raise RuntimeError
-                return orig_fetcher(session, label=label, cert_id=cert_id)
-
-            pkcs11._pull_cert = _trap_pull
-            assert isinstance(signer.cert_registry, SimpleCertificateStore)
-            assert len(list(signer.cert_registry)) == 1
-            out = signers.sign_pdf(w, meta, signer=signer)
-        finally:
-            pkcs11._pull_cert = orig_fetcher
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
+        def _trap_pull(session, *, label=None, cert_id=None):
+            if label != SIGNER_LABEL:
+                raise RuntimeError
+            return orig_fetcher(session, label=label, cert_id=cert_id)
+
+        monkeypatch.setattr(pkcs11, '_pull_cert', _trap_pull)
+        assert isinstance(signer.cert_registry, SimpleCertificateStore)
+        assert sum(1 for _ in signer.cert_registry) == 1
+        emb = _sign_and_read(w, DEFAULT_META, signer)
+
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
@@ -143,102 +237,76 @@ def test_sign_external_certs(bulk_fetch):
 @freeze_time('2020-11-01')
 def test_sign_multiple_cert_sources(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=('root',),
-            ca_chain=(TESTING_CA.get_cert(CertLabel('interm')),),
+            ca_chain=(INTERM_CERT,),
             bulk_fetch=bulk_fetch
         )
         assert isinstance(signer.cert_registry, SimpleCertificateStore)
-        assert len(list(signer.cert_registry)) == 2
-        out = signers.sign_pdf(w, meta, signer=signer)
+        assert sum(1 for _ in signer.cert_registry) == 2
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@pytest.mark.parametrize('bulk_fetch', [True, False])
-@freeze_time('2020-11-01')
-def test_wrong_key_label(bulk_fetch):
+def test_wrong_key_label():
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
-        signer = pkcs11.PKCS11Signer(
-            sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
-            bulk_fetch=bulk_fetch, key_label='NoSuchKeyExists'
-        )
+        signer = _prewarmed_signer(sess, key_label='NoSuchKeyExists')
         with pytest.raises(NoSuchKey):
-            signers.sign_pdf(w, meta, signer=signer)
+            signers.sign_pdf(w, DEFAULT_META, signer=signer)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@pytest.mark.parametrize('bulk_fetch', [True, False])
-@freeze_time('2020-11-01')
-def test_wrong_cert(bulk_fetch):
+def test_wrong_cert():
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, key_label=SIGNER_LABEL,
             other_certs_to_pull=default_other_certs,
-            bulk_fetch=bulk_fetch, cert_id=binascii.unhexlify(b'deadbeef')
+            cert_id=BAD_CERT_ID
         )
-        with pytest.raises(PKCS11Error, match='Could not find.*with ID'):
-            signers.sign_pdf(w, meta, signer=signer)
+        with pytest.raises(PKCS11Error, match=ERR_CERT_ID_NOT_FOUND):
+            signers.sign_pdf(w, DEFAULT_META, signer=signer)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @freeze_time('2020-11-01')
 def test_provided_certs():
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
-    signer_cert = TESTING_CA.get_cert(CertLabel('signer1'))
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, key_label=SIGNER_LABEL,
-            signing_cert=signer_cert,
-            ca_chain={
-                TESTING_CA.get_cert(CertLabel('root')),
-                TESTING_CA.get_cert(CertLabel('interm')),
-            },
+            signing_cert=SIGNER_CERT,
+            ca_chain={ROOT_CERT, INTERM_CERT},
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
-    assert emb.signer_cert.dump() == signer_cert.dump()
+    assert emb.signer_cert.dump() == SIGNER_CERT.dump()
     # this will fail if the intermediate cert is not present
     val_trusted(emb)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@pytest.mark.parametrize('bulk_fetch', [True, False])
 @freeze_time('2020-11-01')
-def test_signer_provided_others_pulled(bulk_fetch):
+def test_signer_provided_others_pulled():
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL,
-            ca_chain={
-                TESTING_CA.get_cert(CertLabel('root')),
-                TESTING_CA.get_cert(CertLabel('interm')),
-            },
+            ca_chain={ROOT_CERT, INTERM_CERT},
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
@@ -248,39 +316,32 @@ def test_signer_provided_others_pulled(bulk_fetch):
 @freeze_time('2020-11-01')
 def test_signer_pulled_others_provided(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
-    signer_cert = TESTING_CA.get_cert(CertLabel('signer1'))
+    w = _fresh_writer()
     with _simple_sess() as sess:
         signer = pkcs11.PKCS11Signer(
             sess, key_label=SIGNER_LABEL,
-            signing_cert=signer_cert, bulk_fetch=bulk_fetch,
+            signing_cert=SIGNER_CERT, bulk_fetch=bulk_fetch,
             other_certs_to_pull=default_other_certs
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
-    assert emb.signer_cert.dump() == signer_cert.dump()
+    assert emb.signer_cert.dump() == SIGNER_CERT.dump()
     # this will fail if the intermediate cert is not present
     val_trusted(emb)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@freeze_time('2020-11-01')
 def test_unclear_key_label():
-    signer_cert = TESTING_CA.get_cert(CertLabel('signer1'))
     with _simple_sess() as sess:
         with pytest.raises(SigningError, match='\'key_label\'.*must be prov'):
             pkcs11.PKCS11Signer(
-                sess, signing_cert=signer_cert,
+                sess, signing_cert=SIGNER_CERT,
                 other_certs_to_pull=default_other_certs,
             )
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@freeze_time('2020-11-01')
 def test_unclear_signer_cert():
     with _simple_sess() as sess:
         with pytest.raises(SigningError, match='Please specify'):
@@ -294,21 +355,16 @@ def test_unclear_signer_cert():
 @freeze_time('2020-11-01')
 def test_simple_sign_dsa(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(
-        field_name='Sig1', md_algorithm='sha256'
-    )
+    w = _fresh_writer()
     with _simple_sess(token='testdsa') as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_SHA256_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
-    val_trusted(emb, vc=SIMPLE_DSA_V_CONTEXT())
+    val_trusted(emb, vc=_dsa_vc())
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
@@ -316,21 +372,16 @@ def test_simple_sign_dsa(bulk_fetch):
 @freeze_time('2020-11-01')
 def test_simple_sign_ecdsa(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(
-        field_name='Sig1', md_algorithm='sha256'
-    )
+    w = _fresh_writer()
     with _simple_sess(token='testecdsa') as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch, use_raw_mechanism=True
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_SHA256_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
-    val_trusted(emb, vc=SIMPLE_ECC_V_CONTEXT())
+    val_trusted(emb, vc=_ecc_vc())
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
@@ -338,17 +389,14 @@ def test_simple_sign_ecdsa(bulk_fetch):
 @freeze_time('2020-11-01')
 def test_simple_sign_ed25519(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess(token='tested25519') as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch,
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb, vc=SIMPLE_ED25519_V_CONTEXT())
 
@@ -358,47 +406,42 @@ def test_simple_sign_ed25519(bulk_fetch):
 @freeze_time('2020-11-01')
 def test_simple_sign_ed448(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     with _simple_sess(token='tested448') as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch,
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb, vc=SIMPLE_ED448_V_CONTEXT())
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
+@pytest.mark.parametrize('raw_mechanism', [False, True])
 @freeze_time('2020-11-01')
-def test_simple_sign_from_config():
+def test_simple_sign_from_config(raw_mechanism, fresh_login_state):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     config = PKCS11SignatureConfig(
         module_path=pkcs11_test_module, token_criteria=TokenCriteria('testrsa'),
-        cert_label=SIGNER_LABEL, user_pin='1234', other_certs_to_pull=None
+        cert_label=SIGNER_LABEL, user_pin='1234', other_certs_to_pull=None,
+        raw_mechanism=raw_mechanism
     )
 
     with PKCS11SigningContext(config) as signer:
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
     val_trusted(emb)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @freeze_time('2020-11-01')
-def test_sign_skip_login_fail():
+def test_sign_skip_login_fail(fresh_login_state):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     config = PKCS11SignatureConfig(
         module_path=pkcs11_test_module,
         token_criteria=TokenCriteria(label='testrsa'),
@@ -408,7 +451,7 @@ def test_sign_skip_login_fail():
     # no key will be found, since we didn't bother logging in
     with pytest.raises(NoSuchKey):
         with PKCS11SigningContext(config) as signer:
-            signers.sign_pdf(w, meta, signer=signer)
+            signers.sign_pdf(w, DEFAULT_META, signer=signer)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
@@ -423,8 +466,7 @@ def test_sign_skip_login_fail():
 @freeze_time('2020-11-01')
 def test_sign_deferred_auth():
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     config = PKCS11SignatureConfig(
         module_path=pkcs11_test_module,
         token_criteria=TokenCriteria('testrsa'),
@@ -435,29 +477,7 @@ def test_sign_deferred_auth():
     with pytest.raises(PKCS11Error,
                        match="Protected auth.*not supported by loaded module"):
         with PKCS11SigningContext(config) as signer:
-            signers.sign_pdf(w, meta, signer=signer)
-
-
-@pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@freeze_time('2020-11-01')
-def test_simple_sign_with_raw_rsa():
-
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
-    config = PKCS11SignatureConfig(
-        module_path=pkcs11_test_module,
-        token_criteria=TokenCriteria('testrsa'),
-        cert_label=SIGNER_LABEL, user_pin='1234', other_certs_to_pull=None,
-        raw_mechanism=True
-    )
-
-    with PKCS11SigningContext(config) as signer:
-        out = signers.sign_pdf(w, meta, signer=signer)
-
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
-    assert emb.field_name == 'Sig1'
-    val_trusted(emb)
+            signers.sign_pdf(w, DEFAULT_META, signer=signer)
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
@@ -465,36 +485,27 @@ def test_simple_sign_with_raw_rsa():
 @freeze_time('2020-11-01')
 def test_simple_sign_with_raw_dsa(bulk_fetch):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(
-        field_name='Sig1', md_algorithm='sha256'
-    )
+    w = _fresh_writer()
     with _simple_sess(token='testdsa') as sess:
         signer = pkcs11.PKCS11Signer(
             sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
             bulk_fetch=bulk_fetch, use_raw_mechanism=True
         )
-        out = signers.sign_pdf(w, meta, signer=signer)
+        emb = _sign_and_read(w, DEFAULT_SHA256_META, signer)
 
-    r = PdfFileReader(out)
-    emb = r.embedded_signatures[0]
     assert emb.field_name == 'Sig1'
-    val_trusted(emb, vc=SIMPLE_DSA_V_CONTEXT())
+    val_trusted(emb, vc=_dsa_vc())
 
 
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 def test_no_raw_pss():
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(
-        field_name='Sig1', md_algorithm='sha256'
-    )
+    w = _fresh_writer()
     with _simple_sess(token='testrsa') as sess:
-        signer = pkcs11.PKCS11Signer(
-            sess, SIGNER_LABEL, other_certs_to_pull=default_other_certs,
-            use_raw_mechanism=True, prefer_pss=True
+        signer = _prewarmed_signer(
+            sess, use_raw_mechanism=True, prefer_pss=True
         )
         with pytest.raises(NotImplementedError, match='PSS not available'):
-            signers.sign_pdf(w, meta, signer=signer)
+            signers.sign_pdf(w, DEFAULT_SHA256_META, signer=signer)
 
 
 def test_unsupported_algo():
@@ -533,15 +544,40 @@ def test_pull_err_fmt(label, cert_id, no_results, exp_err):
     assert err == exp_err
 
 
+class _DummyCertSession:
+    def __init__(self, cert_der):
+        self.cert_der = cert_der
+        self.query_count = 0
+
+    def get_objects(self, query_params):
+        self.query_count += 1
+        yield {Attribute.VALUE: self.cert_der}
+
+
+def test_pull_cert_cached():
+    sess = _DummyCertSession(SIGNER_CERT.dump())
+    cert1 = pkcs11._pull_cert(sess, label=SIGNER_LABEL)
+    cert2 = pkcs11._pull_cert(sess, label=SIGNER_LABEL)
+    assert cert1.dump() == cert2.dump() == SIGNER_CERT.dump()
+    # the second pull should have been answered from the cache
+    assert sess.query_count == 1
+    # the cache shouldn't keep the session alive, nor its entries around
+    sess_ref = weakref.ref(sess)
+    del sess
+    gc.collect()
+    assert sess_ref() is None
+
+
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
-@pytest.mark.parametrize('bulk_fetch,pss', [(True, True), (False, False),
-                                            (True, False), (True, True)])
+@pytest.mark.parametrize(
+    'bulk_fetch,pss', list(itertools.product([True, False], [True, False]))
+)
 @freeze_time('2020-11-01')
 @pytest.mark.asyncio
-async def test_simple_sign_from_config_async(bulk_fetch, pss):
+async def test_simple_sign_from_config_async(
+        bulk_fetch, pss, fresh_login_state):
 
-    w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
-    meta = signers.PdfSignatureMetadata(field_name='Sig1')
+    w = _fresh_writer()
     config = PKCS11SignatureConfig(
         module_path=pkcs11_test_module, token_criteria=TokenCriteria('testrsa'),
         other_certs_to_pull=default_other_certs,
@@ -549,7 +585,7 @@ async def test_simple_sign_from_config_async(bulk_fetch, pss):
         cert_label=SIGNER_LABEL, user_pin='1234'
     )
     async with PKCS11SigningContext(config=config) as signer:
-        pdf_signer = signers.PdfSigner(meta, signer)
+        pdf_signer = signers.PdfSigner(DEFAULT_META, signer)
         out = await pdf_signer.async_sign_pdf(w)
 
     r = PdfFileReader(out)
@@ -558,12 +594,47 @@ async def test_simple_sign_from_config_async(bulk_fetch, pss):
     await async_val_trusted(emb)
 
 
+@pytest.fixture
+def async_pkcs11_ctx(fresh_login_state):
+    # Note: deliberately function-scoped. The context logs in on entry, so
+    # it needs the application in public state (hence fresh_login_state),
+    # and a longer-lived scope would keep the application logged in under
+    # tests that manage their own login on the same token. The context
+    # closes its session on exit, which logs the application back out.
+    config = PKCS11SignatureConfig(
+        module_path=pkcs11_test_module,
+        token_criteria=TokenCriteria('testrsa'),
+        other_certs_to_pull=default_other_certs,
+        cert_label=SIGNER_LABEL, user_pin='1234'
+    )
+    with PKCS11SigningContext(config) as signer:
+        yield signer
+
+
+@pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
+@freeze_time('2020-11-01')
+@pytest.mark.asyncio
+async def test_async_sign_shared_context(async_pkcs11_ctx):
+    # sign several documents with one shared signing context: there should
+    # be exactly one login for the lot (after the object load, async_sign_raw
+    # only talks to the token through an executor, so the signer is safe to
+    # reuse across event loops)
+    for _ in range(2):
+        w = _fresh_writer()
+        pdf_signer = signers.PdfSigner(DEFAULT_META, async_pkcs11_ctx)
+        out = await pdf_signer.async_sign_pdf(w)
+        emb = PdfFileReader(out).embedded_signatures[0]
+        assert emb.field_name == 'Sig1'
+        await async_val_trusted(emb)
+
+
 # @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @pytest.mark.skip  # FIXME flaky test, sometimes coredumps with SoftHSM
-@pytest.mark.parametrize('bulk_fetch,pss', [(True, True), (False, False),
-                                            (True, False), (True, True)])
+@pytest.mark.parametrize(
+    'bulk_fetch,pss', list(itertools.product([True, False], [True, False]))
+)
 @pytest.mark.asyncio
-async def test_async_sign_many_concurrent(bulk_fetch, pss):
+async def test_async_sign_many_concurrent(bulk_fetch, pss, fresh_login_state):
 
     concurrent_count = 10
     config = PKCS11SignatureConfig(
@@ -575,18 +646,18 @@ async def test_async_sign_many_concurrent(bulk_fetch, pss):
     )
     async with PKCS11SigningContext(config=config) as signer:
         async def _job(_i):
-            w = IncrementalPdfFileWriter(BytesIO(MINIMAL))
+            w = _fresh_writer()
             meta = signers.PdfSignatureMetadata(
                 field_name='Sig1', reason=f"PKCS#11 concurrency test #{_i}!"
             )
             pdf_signer = signers.PdfSigner(meta, signer)
             sig_result = await pdf_signer.async_sign_pdf(w, in_place=True)
-            await asyncio.sleep(2)
             return _i, sig_result
 
-        jobs = asyncio.as_completed(map(_job, range(1, concurrent_count + 1)))
-        for finished_job in jobs:
-            i, out = await finished_job
+        results = await asyncio.gather(
+            *(_job(i) for i in range(1, concurrent_count + 1))
+        )
+        for i, out in results:
             r = PdfFileReader(out)
             emb = r.embedded_signatures[0]
             assert emb.field_name == 'Sig1'
@@ -597,8 +668,9 @@ async def test_async_sign_many_concurrent(bulk_fetch, pss):
 
 # @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 @pytest.mark.skip  # FIXME flaky test, sometimes coredumps with SoftHSM
-@pytest.mark.parametrize('bulk_fetch,pss', [(True, True), (False, False),
-                                            (True, False), (True, True)])
+@pytest.mark.parametrize(
+    'bulk_fetch,pss', list(itertools.product([True, False], [True, False]))
+)
 @pytest.mark.asyncio
 async def test_async_sign_raw_many_concurrent_no_preload_objs(bulk_fetch, pss):
     concurrent_count = 10
@@ -615,12 +687,12 @@ async def test_async_sign_raw_many_concurrent_no_preload_objs(bulk_fetch, pss):
         async def _job(_i):
             payload = f"PKCS#11 concurrency test #{_i}!".encode('utf8')
             sig_result = await signer.async_sign_raw(payload, 'sha256')
-            await asyncio.sleep(2)
             return _i, sig_result
 
-        jobs = asyncio.as_completed(map(_job, range(1, concurrent_count + 1)))
-        for finished_job in jobs:
-            i, sig = await finished_job
+        results = await asyncio.gather(
+            *(_job(i) for i in range(1, concurrent_count + 1))
+        )
+        for i, sig in results:
             general.validate_raw(
                 signature=sig,
                 signed_data=f"PKCS#11 concurrency test #{i}!".encode('utf8'),
@@ -642,7 +714,7 @@ def test_token_does_not_exist():
 @pytest.mark.skipif(SKIP_PKCS11, reason="no PKCS#11 module")
 def test_token_unclear():
 
-    with pytest.raises(PKCS11Error, match='more than 1'):
+    with pytest.raises(PKCS11Error, match=ERR_MULTIPLE_TOKENS):
         return pkcs11.open_pkcs11_session(
             pkcs11_test_module, user_pin='1234', token_label=None
         )
@@ -694,58 +766,60 @@ class DummySlot(p11_types.Slot):
         raise NotImplementedError
 
 
-@pytest.mark.parametrize('slot_list,slot_no_query,token_criteria', [
-    (('foo',), None, None),
-    (('foo', 'bar'), 0, TokenCriteria(label='foo')),
-    (('foo', None, 'bar'), 0, TokenCriteria(label='foo')),
-    (('foo', None, 'bar'), None, TokenCriteria(label='foo')),
+@functools.lru_cache(maxsize=None)
+def _slots(slot_list):
+    # the same slot layouts recur across the find_token tests, and the tests
+    # don't mutate the slots, so build each layout only once
+    return [DummySlot(lbl) for lbl in slot_list]
+
+
+@pytest.mark.parametrize('slot_list,slot_no_query,token_criteria,expected', [
+    # cases where a token should be found
+    (('foo',), None, None, ('ok',)),
+    (('foo', 'bar'), 0, TokenCriteria(label='foo'), ('ok',)),
+    (('foo', None, 'bar'), 0, TokenCriteria(label='foo'), ('ok',)),
+    (('foo', None, 'bar'), None, TokenCriteria(label='foo'), ('ok',)),
     (('foo', None, 'bar'), None,
-     TokenCriteria(label='foo', serial=b'foo-\xde\xad\xbe\xef')),
+     TokenCriteria(label='foo', serial=b'foo-\xde\xad\xbe\xef'), ('ok',)),
     (('foo', None, 'bar'), None,
-     TokenCriteria(serial=b'foo-\xde\xad\xbe\xef')),
+     TokenCriteria(serial=b'foo-\xde\xad\xbe\xef'), ('ok',)),
     (('foo', None, 'bar'), None,
-     TokenCriteria(serial=b'bar-\xde\xad\xbe\xef')),
+     TokenCriteria(serial=b'bar-\xde\xad\xbe\xef'), ('ok',)),
     # skip over empty slots when doing this scan
-    ((None, 'foo', None, 'bar'), None, TokenCriteria(label='foo')),
-    ((None, 'foo', None), 1, None),
-])
-def test_find_token(slot_list, slot_no_query, token_criteria):
-    tok = find_token(
-        [DummySlot(lbl) for lbl in slot_list],
-        slot_no=slot_no_query, token_criteria=token_criteria
-    )
-    assert tok is not None
-    criteria_satisfied_by(token_criteria, tok)
-
-
-@pytest.mark.parametrize('slot_list,slot_no_query,criteria,err', [
-    (('foo', 'bar'), 2, TokenCriteria(label='foo'), 'too large'),
-    (('foo', 'bar'), 1, TokenCriteria(label='foo'), 'label is not \'foo\''),
+    ((None, 'foo', None, 'bar'), None, TokenCriteria(label='foo'), ('ok',)),
+    ((None, 'foo', None), 1, None, ('ok',)),
+    # cases where the lookup should error out
+    (('foo', 'bar'), 2, TokenCriteria(label='foo'),
+     ('err', re.compile('too large'))),
+    (('foo', 'bar'), 1, TokenCriteria(label='foo'),
+     ('err', re.compile("label is not 'foo'"))),
     (('foo', 'bar'), 1, TokenCriteria(serial=b'foo-\xde\xad\xbe\xef'),
-     'serial is not \'666f6f2ddeadbeef\''),
+     ('err', re.compile("serial is not '666f6f2ddeadbeef'"))),
     # when querying by slot, we want the error to be passed on
-    ((None, 'bar'), 0, None, 'No token in'),
-    (('foo', 'bar'), None, None, 'more than 1'),
+    ((None, 'bar'), 0, None, ('err', re.compile('No token in'))),
+    (('foo', 'bar'), None, None, ('err', ERR_MULTIPLE_TOKENS)),
     # right now, we don't care about the status of the slot in any way
-    (('foo', None), None, None, 'more than 1'),
-])
-def test_find_token_error(slot_list, slot_no_query, criteria, err):
-    with pytest.raises(PKCS11Error, match=err):
-        find_token(
-            [DummySlot(lbl) for lbl in slot_list],
-            slot_no=slot_no_query, token_criteria=criteria
-        )
-
-
-@pytest.mark.parametrize('slot_list,token_lbl_query', [
-    ((None, 'bar'), 'foo'),
-    (('foo', 'bar'), 'baz'),
-    ((None, None), 'foo'),
-    ((), 'foo'),
+    (('foo', None), None, None, ('err', ERR_MULTIPLE_TOKENS)),
+    # cases where there's simply no matching token
+    ((None, 'bar'), None, TokenCriteria(label='foo'), ('none',)),
+    (('foo', 'bar'), None, TokenCriteria(label='baz'), ('none',)),
+    ((None, None), None, TokenCriteria(label='foo'), ('none',)),
+    ((), None, TokenCriteria(label='foo'), ('none',)),
 ])
-def test_token_not_found(slot_list, token_lbl_query):
+def test_find_token(slot_list, slot_no_query, token_criteria, expected):
+    if expected[0] == 'err':
+        with pytest.raises(PKCS11Error, match=expected[1]):
+            find_token(
+                _slots(slot_list),
+                slot_no=slot_no_query, token_criteria=token_criteria
+            )
+        return
     tok = find_token(
-        [DummySlot(lbl) for lbl in slot_list],
-        slot_no=None, token_criteria=TokenCriteria(label=token_lbl_query)
+        _slots(slot_list),
+        slot_no=slot_no_query, token_criteria=token_criteria
     )
-    assert tok is None
+    if expected[0] == 'ok':
+        assert tok is not None
+        criteria_satisfied_by(token_criteria, tok)
+    else:
+        assert tok is None
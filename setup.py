@@ -91,7 +91,7 @@ setup(
         'async_http': ['aiohttp~=3.8.0']
     },
     tests_require=[
-        'pytest>=6.1.1', 'requests-mock>=1.8.0',
+        'pytest>=6.1.1', 'pytest-xdist>=2.5.0', 'requests-mock>=1.8.0',
         'freezegun>=1.1.0', 'certomancer~=0.9.1',
         'aiohttp~=3.8.0', 'pytest-aiohttp~=1.0.4',
         'certomancer-csc-dummy==0.2.1'